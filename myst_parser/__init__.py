@@ -17,7 +17,13 @@ def setup_sphinx(app):
     """Initialize all settings and transforms in Sphinx."""
     # we do this separately to setup,
     # so that it can be called by external packages like myst_nb
-    from myst_parser.myst_refs import MystReferenceResolver
+    from myst_parser.myst_refs import (
+        MystReferenceResolver,
+        init_myst_xref_docs,
+        merge_myst_xref_docs,
+        purge_myst_xref_docs,
+        reset_std_target_index,
+    )
     from myst_parser.myst_amsmath import MystAmsMathTransform
     from myst_parser.main import MdParserConfig
 
@@ -29,6 +35,10 @@ def setup_sphinx(app):
             app.add_config_value(f"myst_{name}", default, "env")
 
     app.connect("builder-inited", create_myst_config)
+    app.connect("builder-inited", init_myst_xref_docs)
+    app.connect("env-purge-doc", purge_myst_xref_docs)
+    app.connect("env-merge-info", merge_myst_xref_docs)
+    app.connect("env-updated", reset_std_target_index)
 
 
 def create_myst_config(app):
@@ -37,6 +37,9 @@ class MdParserConfig:
 
     override_mathjax: bool = attr.ib(default=True, validator=instance_of(bool))
 
+    ref_warn_ambiguous: bool = attr.ib(default=True, validator=instance_of(bool))
+    ref_prefer_std_ref: bool = attr.ib(default=True, validator=instance_of(bool))
+
     admonition_enable: bool = attr.ib(default=False, validator=instance_of(bool))
 
     disable_syntax: List[str] = attr.ib(
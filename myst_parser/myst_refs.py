@@ -3,8 +3,9 @@
 This is applied to MyST type references only, such as ``[text](target)``,
 and allows for nested syntax
 """
-import os
-from typing import Any, List, Tuple
+from logging import WARNING
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 from typing import cast
 
 from docutils import nodes
@@ -12,6 +13,9 @@ from docutils.nodes import document, Element
 
 from sphinx import addnodes
 from sphinx.addnodes import pending_xref
+from sphinx.application import Sphinx
+from sphinx.domains import Domain
+from sphinx.environment import BuildEnvironment
 from sphinx.locale import __
 from sphinx.transforms.post_transforms import ReferencesResolver
 from sphinx.util import docname_join, logging
@@ -26,68 +30,303 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 
+def is_myst_xref(node: nodes.Node) -> bool:
+    """Return whether the node is a reference generated by the "myst" role."""
+    return isinstance(node, addnodes.pending_xref) and node.get("reftype") == "myst"
+
+
+def init_myst_xref_docs(app: Sphinx) -> None:
+    """Initialise the record of documents containing "myst" references.
+
+    This is only done for a fresh environment,
+    since documents already read would not have been recorded.
+    """
+    if not hasattr(app.env, "myst_xref_docs") and not app.env.all_docs:
+        app.env.myst_xref_docs = set()
+
+
+def purge_myst_xref_docs(app: Sphinx, env: BuildEnvironment, docname: str) -> None:
+    """Remove a document from the record of documents containing references."""
+    if getattr(env, "myst_xref_docs", None) is not None:
+        env.myst_xref_docs.discard(docname)
+
+
+def merge_myst_xref_docs(
+    app: Sphinx, env: BuildEnvironment, docnames: Set[str], other: BuildEnvironment
+) -> None:
+    """Merge the record of documents containing references, from a parallel read."""
+    if getattr(env, "myst_xref_docs", None) is not None:
+        env.myst_xref_docs.update(docnames.intersection(other.myst_xref_docs))
+
+
+def reset_std_target_index(app: Sphinx, env: BuildEnvironment) -> None:
+    """Allow the index of standard objects to be shared, once reading has finished.
+
+    The standard domain data does not change while documents are written,
+    so the index need only be built once, rather than for every document.
+    """
+    env.myst_std_target_index = None
+
+
+def _classes_for_role(role: str) -> List[str]:
+    """Return the classes for a node resolved by a role, e.g. ``std:ref``.
+
+    These are interned, since they are shared by many nodes.
+    """
+    return [sys.intern(role.split(":")[0]), sys.intern(role.replace(":", "-"))]
+
+
+def _stringify_candidate(name: str, node: Element) -> str:
+    """Format a candidate resolution of a reference, for warning messages."""
+    reftitle = node.get("reftitle") or node.astext()
+    return f":{name}:`{reftitle}`"
+
+
 class MystReferenceResolver(ReferencesResolver):
     """Resolves cross-references on doctrees.
 
     Overrides default sphinx implementation, to allow for nested syntax
     """
 
-    default_priority = 9  # higher priority than ReferencesResolver (10)
+    # higher priority than ReferencesResolver (10), which would otherwise resolve
+    # "myst" references without nested syntax, or warn that they are missing
+    default_priority = 9
 
     def run(self, **kwargs: Any) -> None:
         self.document: document
-        for node in self.document.traverse(addnodes.pending_xref):
-            if node["reftype"] != "myst":
-                continue
-
-            contnode = cast(nodes.TextElement, node[0].deepcopy())
-            newnode = None
 
+        if not self._may_contain_myst_xrefs():
+            return
+
+        # only look for every possible match if ambiguities are to be warned about
+        self._collect_all = self.env.myst_config.ref_warn_ambiguous
+        self._prefer_std_ref = self.env.myst_config.ref_prefer_std_ref
+
+        # the standard domain data is fixed for the duration of the run,
+        # so we look it up once, rather than for every reference
+        self._stddomain = self.env.get_domain("std")
+        self._std_objtype_roles = tuple(
+            (objtype, "std:" + self._stddomain.role_for_objtype(objtype))
+            for objtype in self._stddomain.object_types
+        )
+        self._std_objects = self._stddomain.objects
+        self._std_labels = self._stddomain.labels
+        self._std_anonlabels = self._stddomain.anonlabels
+
+        # the classes added for each resolved role (others are added as found)
+        self._role_classes = {
+            role: _classes_for_role(role)
+            for role in ("std:ref", "std:doc", *(r for _, r in self._std_objtype_roles))
+        }  # type: Dict[str, List[str]]
+
+        # built on first use (see ``_get_std_target_index``)
+        self._std_target_index = None  # type: Optional[Dict[str, List[tuple]]]
+
+        # the other domains to resolve against, skipping those that cannot match
+        self._other_domains = []  # type: List[Tuple[Domain, bool]]
+        for domain in self.env.domains.values():
+            if domain.name == "std":
+                continue  # this is resolved separately
+            objects = getattr(domain, "objects", None)
+            if objects is not None and not objects:
+                continue  # there is nothing in the domain to reference
+            # domains which do not override resolve_any_xref (the newer interface)
+            # have to be resolved for each of their roles
+            any_xref = type(domain).resolve_any_xref is not Domain.resolve_any_xref
+            if any_xref or domain.roles:
+                self._other_domains.append((domain, any_xref))
+
+        # documents can change between runs, so these caches are only kept per run
+        self._docname_cache = {}  # type: Dict[Tuple[str, str], Optional[str]]
+        self._title_cache = {}  # type: Dict[str, str]
+        self._source_suffixes = tuple(self.env.config.source_suffix)
+
+        # filter within the traversal, rather than visiting every pending_xref,
+        # and materialise the list, since nodes are replaced as we go
+        nodes_to_resolve = list(
+            self.document.traverse(is_myst_xref)
+        )  # type: List[pending_xref]
+
+        # the same target is often referenced many times in a document,
+        # so we resolve it once, then copy the result for the other references
+        # (along with the candidates of an ambiguous resolution, to warn again)
+        self._resolved = {}  # type: Dict[Tuple[str, str, bool], tuple]
+
+        # bind loop invariants locally, since the loop can run many times
+        default_docname = self.env.docname
+        resolve = self._resolve_myst_ref_once
+        copy_contnode = self._copy_contnode
+        emit_missing = self._emit_missing_ref_as_any
+        warn = self.warn_missing_reference
+
+        for node in nodes_to_resolve:
             typ = node["reftype"]
             target = node["reftarget"]
-            refdoc = node.get("refdoc", self.env.docname)
+            refdoc = node.get("refdoc", default_docname)
             domain = None
 
             try:
-                newnode = self.resolve_myst_ref(refdoc, node, contnode)
+                newnode = resolve(refdoc, node)
                 if newnode is None:
+                    contnode = copy_contnode(node)
                     # no new node found? try the missing-reference event
-                    # but first we change the the reftype to 'any'
-                    # this means it is picked up by extensions like intersphinx
-                    node["reftype"] = "any"
-                    newnode = self.app.emit_firstresult(
-                        "missing-reference", self.env, node, contnode
-                    )
-                    node["reftype"] = "myst"
+                    newnode = emit_missing(node, contnode)
                     # still not found? warn if node wishes to be warned about or
                     # we are in nit-picky mode
                     if newnode is None:
                         node["refdomain"] = ""
-                        self.warn_missing_reference(refdoc, typ, target, node, domain)
+                        warn(refdoc, typ, target, node, domain)
+                        newnode = contnode
             except NoUri:
-                newnode = contnode
+                newnode = copy_contnode(node)
+
+            node.replace_self(newnode)
+
+    def _may_contain_myst_xrefs(self) -> bool:
+        """Return whether the document may contain "myst" references.
+
+        This uses the documents recorded by the renderer,
+        to avoid traversing documents which contain none.
+        """
+        xref_docs = getattr(self.env, "myst_xref_docs", None)
+        if xref_docs is None:
+            # documents have not been recorded, so we cannot tell
+            return True
+        if self.document.get("source") != self.env.doc2path(self.env.docname):
+            # this is not the parsed doctree of the document, but e.g. content
+            # copied by an extension (such as a todolist), so we cannot tell
+            return True
+
+        # builders such as singlehtml and latex inline the doctrees of toctree
+        # descendants into the document, and (for latex and texinfo) append the
+        # appendices, so these must also be checked
+        docnames = [self.env.docname]
+        for name in ("latex_appendices", "texinfo_appendices"):
+            docnames.extend(getattr(self.config, name, ()))
+        seen = set()  # type: Set[str]
+        while docnames:
+            docname = docnames.pop()
+            if docname in xref_docs:
+                return True
+            if docname not in seen:
+                seen.add(docname)
+                docnames.extend(self.env.toctree_includes.get(docname, ()))
+        return False
+
+    def _get_std_target_index(self) -> Dict[str, List[tuple]]:
+        """Return the standard objects indexed by name.
+
+        This means each reference requires a single lookup,
+        rather than probing every object type.
+        Entries are ``(objtype position, objtype, domain role, docname, labelid)``,
+        so that sorting them retains the precedence of ``object_types``.
+
+        Once all documents have been read, the index is shared across documents
+        (see ``reset_std_target_index``).
+        """
+        if self._std_target_index is not None:
+            return self._std_target_index
+        shared = getattr(self.env, "myst_std_target_index", False)
+        if shared:
+            self._std_target_index = shared
+            return shared
+
+        positions = {
+            objtype: (i, domain_role)
+            for i, (objtype, domain_role) in enumerate(self._std_objtype_roles)
+        }
+        index = {}  # type: Dict[str, List[tuple]]
+        for (objtype, name), (docname, labelid) in self._std_objects.items():
+            if objtype in positions:
+                position, domain_role = positions[objtype]
+                index.setdefault(name, []).append(
+                    (position, objtype, domain_role, docname, labelid)
+                )
 
-            node.replace_self(newnode or contnode)
+        self._std_target_index = index
+        if shared is None:
+            self.env.myst_std_target_index = index
+        return index
 
-    def _resolve_ref_nested(self, node: pending_xref, fromdocname: str) -> Element:
+    def _resolve_myst_ref_once(
+        self, refdoc: str, node: pending_xref
+    ) -> Optional[Element]:
+        """Resolve a "myst" reference, reusing the resolution of any previous reference
+        with the same document, target and explicit title flag.
+        """
+        key = (refdoc, node["reftarget"], node["refexplicit"])
+        if key in self._resolved:
+            previous, candidates = self._resolved[key]
+            if candidates is not None:
+                self._warn_ambiguous(node, candidates)
+            if previous is None:
+                return None
+            if not node["refexplicit"]:
+                return previous.deepcopy()
+            # swap in the content of this reference
+            newnode = previous.copy()
+            innernode = previous[0].copy()
+            innernode.extend(node[0].children)
+            newnode.append(innernode)
+            return newnode
+
+        results = self._find_myst_results(refdoc, node)
+        if not results:
+            self._resolved[key] = (None, None)
+            return None
+        candidates = self._check_ambiguous(node, results)
+        result = results[0]
+        newnode = self._finalize(result)
+        # the content of explicit references can only be swapped in
+        # for std resolutions, whose node structure we know
+        if not node["refexplicit"] or result[0].startswith("std:"):
+            self._resolved[key] = (newnode, candidates)
+        return newnode
+
+    def _emit_missing_ref_as_any(
+        self, node: pending_xref, contnode: Element
+    ) -> Optional[Element]:
+        """Emit the missing-reference event, with the reftype changed to 'any'.
+
+        This means it is picked up by extensions like intersphinx.
+        """
+        # the attributes are set directly, since this is called for every miss
+        attributes = node.attributes
+        attributes["reftype"] = "any"
+        try:
+            return self.app.emit_firstresult(
+                "missing-reference", self.env, node, contnode
+            )
+        finally:
+            attributes["reftype"] = "myst"
+
+    @staticmethod
+    def _copy_contnode(node: pending_xref) -> nodes.TextElement:
+        """Return a copy of the content node of the reference."""
+        return cast(nodes.TextElement, node[0].deepcopy())
+
+    def _resolve_ref_nested(
+        self, node: pending_xref, fromdocname: str, node_text: Optional[str] = None
+    ) -> Element:
         """This is the same as ``sphinx.domains.std._resolve_ref_xref``,
         but allows for nested syntax,
         rather than converting the inner nodes to raw text.
+
+        :param node_text: the text of ``node``, if already computed
         """
-        stddomain = self.env.get_domain("std")
         target = node["reftarget"].lower()
 
         if node["refexplicit"]:
             # reference to anonymous label; the reference uses
             # the supplied link caption
-            docname, labelid = stddomain.anonlabels.get(target, ("", ""))
-            sectname = node.astext()
+            docname, labelid = self._std_anonlabels.get(target, ("", ""))
+            sectname = node.astext() if node_text is None else node_text
             innernode = nodes.inline(sectname, "")
             innernode.extend(node[0].children)
         else:
             # reference to named label; the final node will
             # contain the section name after the label
-            docname, labelid, sectname = stddomain.labels.get(target, ("", "", ""))
+            docname, labelid, sectname = self._std_labels.get(target, ("", "", ""))
             innernode = nodes.inline(sectname, sectname)
 
         if not docname:
@@ -95,80 +334,181 @@ class MystReferenceResolver(ReferencesResolver):
 
         return make_refnode(self.app.builder, fromdocname, docname, labelid, innernode)
 
-    def _resolve_doc_nested(self, node: pending_xref, fromdocname: str) -> Element:
+    def _resolve_doc_nested(
+        self, node: pending_xref, fromdocname: str, node_text: Optional[str] = None
+    ) -> Element:
         """This is the same as ``sphinx.domains.std._resolve_doc_xref``,
         but allows for nested syntax,
         rather than converting the inner nodes to raw text.
 
         It also allows for extensions on document names.
+
+        :param node_text: the text of ``node``, if already computed
         """
         # directly reference to document by source name; can be absolute or relative
         refdoc = node.get("refdoc", fromdocname)
-        docname = docname_join(refdoc, node["reftarget"])
-
-        if docname not in self.env.all_docs:
-            # try stripping known extensions from doc name
-            if os.path.splitext(docname)[1] in self.env.config.source_suffix:
-                docname = os.path.splitext(docname)[0]
-            if docname not in self.env.all_docs:
-                return None
+        docname = self._resolve_docname(refdoc, node["reftarget"])
+        if docname is None:
+            return None
 
         if node["refexplicit"]:
             # reference with explicit title
-            caption = node.astext()
+            caption = node.astext() if node_text is None else node_text
             innernode = nodes.inline(caption, "", classes=["doc"])
             innernode.extend(node[0].children)
         else:
             # TODO do we want nested syntax for titles?
-            caption = clean_astext(self.env.titles[docname])
+            caption = self._doc_title(docname)
+            if caption is None:
+                return None
             innernode = nodes.inline(caption, caption, classes=["doc"])
 
         return make_refnode(self.app.builder, fromdocname, docname, None, innernode)
 
+    def _resolve_docname(self, refdoc: str, reftarget: str) -> Optional[str]:
+        """Return the name of the document referenced by ``reftarget``, if it exists.
+
+        Results are cached per run, since the same targets recur across references.
+        """
+        key = (refdoc, reftarget)
+        try:
+            return self._docname_cache[key]
+        except KeyError:
+            pass
+
+        all_docs = self.env.all_docs
+        docname = docname_join(refdoc, reftarget)
+        if docname not in all_docs:
+            # try stripping known extensions from doc name
+            for suffix in self._source_suffixes:
+                if docname.endswith(suffix):
+                    stripped = docname[: -len(suffix)]
+                    if stripped in all_docs:
+                        docname = stripped
+                        break
+            else:
+                docname = None
+
+        self._docname_cache[key] = docname
+        return docname
+
+    def _doc_title(self, docname: str) -> Optional[str]:
+        """Return the plain text title of a document, if it has one (cached per run)."""
+        title = self._title_cache.get(docname)
+        if title is None:
+            title_node = self.env.titles.get(docname)
+            if title_node is None:
+                return None
+            title = self._title_cache[docname] = clean_astext(title_node)
+        return title
+
     def resolve_myst_ref(
-        self, refdoc: str, node: pending_xref, contnode: Element
+        self, refdoc: str, node: pending_xref, contnode: Optional[Element] = None
     ) -> Element:
-        """Resolve reference generated by the "myst" role."""
+        """Resolve reference generated by the "myst" role.
 
-        stddomain = self.env.get_domain("std")
-        target = node["reftarget"]
+        :param contnode: the content node to use for non-nested resolutions;
+            if not given, a copy of the reference content is made only when needed
+        """
+        results = self._find_myst_results(refdoc, node, contnode)
+        if not results:
+            return None
+        self._check_ambiguous(node, results)
+        return self._finalize(results[0])
+
+    def _find_myst_results(
+        self, refdoc: str, node: pending_xref, contnode: Optional[Element] = None
+    ) -> List[Tuple[str, Element]]:
+        """Return the ``(role, node)`` resolutions of a "myst" reference.
+
+        Only the first is returned, unless ambiguity warnings are enabled.
+        """
         results = []  # type: List[Tuple[str, Element]]
+        for result in self._iter_myst_candidates(refdoc, node, contnode):
+            results.append(result)
+            # only the first match is used, so we only look for others to warn about
+            # ambiguities, unless the match is a (preferred) standard reference
+            if not self._collect_all or (
+                self._prefer_std_ref and result[0] == "std:ref"
+            ):
+                break
+        return results
+
+    def _check_ambiguous(
+        self, node: pending_xref, results: List[Tuple[str, Element]]
+    ) -> Optional[str]:
+        """Warn if more than one resolution was found for a "myst" reference.
+
+        :returns: the candidates warned about, if any
+        """
+        if len(results) < 2 or not logger.isEnabledFor(WARNING):
+            return None
+        candidates = " or ".join(
+            [_stringify_candidate(name, role) for name, role in results]
+        )
+        self._warn_ambiguous(node, candidates)
+        return candidates
+
+    def _warn_ambiguous(self, node: pending_xref, candidates: str) -> None:
+        """Warn that a "myst" reference has more than one candidate target."""
+        logger.warning(
+            __(
+                "more than one target found for 'myst' cross-reference "
+                f"{node['reftarget']}: could be {candidates}"
+            ),
+            location=node,
+        )
+
+    def _iter_myst_candidates(
+        self, refdoc: str, node: pending_xref, contnode: Optional[Element]
+    ) -> Iterator[Tuple[str, Element]]:
+        """Yield the possible resolutions of a "myst" reference, in order of precedence.
+
+        This is a generator, so that resolution can stop at the first match.
+        """
+        target = node["reftarget"]
+        # the text is only needed for explicit titles, and is shared by resolvers
+        node_text = node.astext() if node["refexplicit"] else None
 
         # resolve standard references first
-        res = self._resolve_ref_nested(node, refdoc)
+        res = self._resolve_ref_nested(node, refdoc, node_text)
         if res:
-            results.append(("std:ref", res))
+            yield ("std:ref", res)
 
         # next resolve doc names
-        res = self._resolve_doc_nested(node, refdoc)
+        res = self._resolve_doc_nested(node, refdoc, node_text)
         if res:
-            results.append(("std:doc", res))
+            yield ("std:doc", res)
+
+        # the remaining resolvers take a copy of the content,
+        # which we only make if we get this far
+        if contnode is None:
+            contnode = self._copy_contnode(node)
 
         # next resolve for any other standard reference object
-        for objtype in stddomain.object_types:
-            key = (objtype, target)
-            if objtype == "term":
-                key = (objtype, target.lower())
-            if key in stddomain.objects:
-                docname, labelid = stddomain.objects[key]
-                domain_role = "std:" + stddomain.role_for_objtype(objtype)
-                ref_node = make_refnode(
-                    self.app.builder, refdoc, docname, labelid, contnode
-                )
-                results.append((domain_role, ref_node))
+        # (terms are matched by their lower-cased name)
+        std_target_index = self._get_std_target_index()
+        matches = [m for m in std_target_index.get(target, ()) if m[1] != "term"]
+        matches.extend(
+            m for m in std_target_index.get(target.lower(), ()) if m[1] == "term"
+        )
+        for _, _, domain_role, docname, labelid in sorted(matches):
+            ref_node = make_refnode(
+                self.app.builder, refdoc, docname, labelid, contnode
+            )
+            yield (domain_role, ref_node)
 
         # finally resolve for any other type of reference
         # TODO do we want to restrict this?
-        for domain in self.env.domains.values():
-            if domain.name == "std":
-                continue  # we did this one already
-            try:
-                results.extend(
-                    domain.resolve_any_xref(
+        for domain, any_xref in self._other_domains:
+            if any_xref:
+                try:
+                    yield from domain.resolve_any_xref(
                         self.env, refdoc, self.app.builder, target, node, contnode
                     )
-                )
-            except NotImplementedError:
+                except NotImplementedError:
+                    any_xref = False
+            if not any_xref:
                 # the domain doesn't yet support the new interface
                 # we have to manually collect possible references (SLOW)
                 for role in domain.roles:
@@ -176,34 +516,17 @@ class MystReferenceResolver(ReferencesResolver):
                         self.env, refdoc, self.app.builder, role, target, node, contnode
                     )
                     if res and isinstance(res[0], nodes.Element):
-                        results.append((f"{domain.name}:{role}", res))
-
-        # now, see how many matches we got...
-        if not results:
-            return None
-        if len(results) > 1:
-
-            def stringify(name, node):
-                reftitle = node.get("reftitle", node.astext())
-                return f":{name}:`{reftitle}`"
-
-            candidates = " or ".join(stringify(name, role) for name, role in results)
-            logger.warning(
-                __(
-                    f"more than one target found for 'myst' cross-reference {target}: "
-                    f"could be {candidates}"
-                ),
-                location=node,
-            )
+                        yield (f"{domain.name}:{role}", res)
 
-        res_role, newnode = results[0]
+    def _finalize(self, result: Tuple[str, Element]) -> Element:
+        """Return the node for the chosen resolution of a "myst" reference."""
+        res_role, newnode = result
         # Override "myst" class with the actual role type to get the styling
         # approximately correct.
-        res_domain = res_role.split(":")[0]
         if len(newnode) > 0 and isinstance(newnode[0], nodes.Element):
-            newnode[0]["classes"] = newnode[0].get("classes", []) + [
-                res_domain,
-                res_role.replace(":", "-"),
-            ]
+            classes = self._role_classes.get(res_role)
+            if classes is None:
+                classes = self._role_classes[res_role] = _classes_for_role(res_role)
+            newnode[0]["classes"].extend(classes)
 
         return newnode
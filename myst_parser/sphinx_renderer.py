@@ -45,6 +45,11 @@ class SphinxRenderer(DocutilsRenderer):
             wrap_node["title"] = title
         self.current_node.append(wrap_node)
 
+        # record that the document contains references to resolve
+        env = getattr(self.document.settings, "env", None)
+        if getattr(env, "myst_xref_docs", None) is not None:
+            env.myst_xref_docs.add(env.docname)
+
         inner_node = nodes.inline("", "", classes=["xref", "myst"])
         wrap_node.append(inner_node)
         with self.current_node_context(inner_node):
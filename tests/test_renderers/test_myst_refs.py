@@ -20,7 +20,9 @@ import pytest
         ("doc_nested", "[*text*](index)", False),
         ("ref", "(ref)=\n# Title\n[](ref)", False),
         ("ref_nested", "(ref)=\n# Title\n[*text*](ref)", False),
-        ("duplicate", "(index)=\n# Title\n[](index)", True),
+        ("ref_repeated", "(ref)=\n# Title\n[](ref) [*a*](ref) [](ref) [b](ref)", False),
+        ("duplicate_prefer_ref", "(index)=\n# Title\n[](index)", False),
+        ("duplicate_doc", "```{envvar} index\n```\n[](index)", True),
     ],
 )
 def test_parse(test_name, text, should_warn, file_regression):
@@ -44,3 +46,58 @@ def test_parse(test_name, text, should_warn, file_regression):
     content = content.replace("root" + os.sep + "index.md", "root/index.md")
 
     file_regression.check(content, basename=test_name, extension=".xml")
+
+
+@pytest.mark.parametrize(
+    "test_name,text,config,should_warn",
+    [
+        (
+            "duplicate",
+            "(index)=\n# Title\n[](index)",
+            {"ref_prefer_std_ref": False},
+            True,
+        ),
+        (
+            "duplicate_no_warn",
+            "(index)=\n# Title\n[](index)",
+            {"ref_prefer_std_ref": False, "ref_warn_ambiguous": False},
+            False,
+        ),
+    ],
+)
+def test_parse_config(test_name, text, config, should_warn, file_regression):
+
+    with mock_sphinx_env(
+        conf={"extensions": ["myst_parser"]},
+        srcdir="root",
+        with_builder=True,
+        raise_on_warning=True,
+    ) as app:  # type: Sphinx
+        app.env.myst_config = MdParserConfig(**config)
+        document = parse(app, text, docname="index")
+        if should_warn:
+            with pytest.raises(SphinxWarning):
+                app.env.apply_post_transforms(document, "index")
+        else:
+            app.env.apply_post_transforms(document, "index")
+
+    content = document.pformat()
+    # windows fix
+    content = content.replace("root" + os.sep + "index.md", "root/index.md")
+
+    file_regression.check(content, basename=test_name, extension=".xml")
+
+
+def test_repeated_ambiguous_warns():
+    """Test that every occurrence of an ambiguous reference is warned about."""
+    with mock_sphinx_env(
+        conf={"extensions": ["myst_parser"]}, srcdir="root", with_builder=True
+    ) as app:  # type: Sphinx
+        app.env.myst_config = MdParserConfig()
+        document = parse(
+            app, "```{envvar} index\n```\n[](index) [](index)", docname="index"
+        )
+        app.env.apply_post_transforms(document, "index")
+        warnings = app._warning.getvalue()
+
+    assert warnings.count("more than one target found") == 2
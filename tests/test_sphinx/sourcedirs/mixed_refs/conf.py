@@ -0,0 +1,4 @@
+extensions = ["myst_parser", "sphinx.ext.todo"]
+exclude_patterns = ["_build"]
+latex_appendices = ["appendix"]
+todo_include_todos = True
@@ -154,3 +154,63 @@ def test_commonmark_only(
         get_sphinx_app_doctree(app, docname="index", regress=True)
     finally:
         get_sphinx_app_output(app, filename="index.html", regress_html=True)
+
+
+@pytest.mark.sphinx(
+    buildername="html",
+    srcdir=os.path.join(SOURCE_DIR, "mixed_refs"),
+    freshenv=True,
+    parallel=2,
+)
+def test_mixed_refs(
+    app,
+    status,
+    warning,
+    get_sphinx_app_output,
+    remove_sphinx_builds,
+):
+    """test that documents without references are skipped, in a parallel build."""
+    app.build()
+    assert "build succeeded" in status.getvalue()  # Build succeeded
+    warnings = warning.getvalue().strip()
+    assert warnings == ""
+
+    assert app.env.myst_xref_docs == {"page1", "page2", "page3", "appendix"}
+    for filename in ("page1.html", "appendix.html"):
+        content = get_sphinx_app_output(app, filename=filename)
+        assert 'href="other.html#lbl"' in content
+        assert 'href="other.html"' in content
+    content = get_sphinx_app_output(app, filename="other.html")
+    assert 'href="#lbl"' in content
+    # the todolist resolves a copy of the todo, under the name of its document
+    content = get_sphinx_app_output(app, filename="index.html")
+    assert 'href="other.html#lbl"' in content
+
+
+@pytest.mark.sphinx(
+    buildername="latex",
+    srcdir=os.path.join(SOURCE_DIR, "mixed_refs"),
+    freshenv=True,
+    # a master document without references, so only the appendix has them
+    confoverrides={
+        "latex_documents": [("other", "other.tex", "Other", "Author", "manual")]
+    },
+)
+def test_mixed_refs_latex(
+    app,
+    status,
+    warning,
+    get_sphinx_app_output,
+    remove_sphinx_builds,
+):
+    """test references in an assembled doctree, including the appendices."""
+    app.build()
+    assert "build succeeded" in status.getvalue()  # Build succeeded
+    warnings = warning.getvalue().strip()
+    assert warnings == ""
+
+    content = get_sphinx_app_output(app, buildername="latex", filename="other.tex")
+    assert "pending_xref" not in content
+    appendix = content.split(r"\appendix", 1)[1]
+    assert r"\hyperref[\detokenize{appendix:lbl}]" in appendix
+    assert r"\hyperref[\detokenize{other::doc}]" in appendix